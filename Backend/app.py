@@ -1,11 +1,47 @@
-from flask import Flask, jsonify, request
+from flask import Flask, request
 from flask_cors import CORS
+from flask_compress import Compress
 from stock_analysis_service import generate_investment_advice, find_trending_stocks
-import json
+import orjson
+import hashlib
 
 app = Flask(__name__)
 CORS(app)
 
+# Response compression (5Y chart JSON sabse bada payload hai)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+
+def ojson(obj, status=200):
+    """jsonify jaisa JSON response, lekin orjson se (numpy values bhi direct serialize hote hain)."""
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def conditional(response):
+    """Body hash ka ETag lagata hai aur matching If-None-Match par 304 bana deta hai."""
+    response.add_etag()
+    response.cache_control.no_cache = True  # Browser har baar revalidate kare
+    return response.make_conditional(request)
+
+
+def analysis_etag(symbol, analysis_result):
+    """
+    Cache timestamps (+ news links, jo cache nahi hoti) se ETag banata hai.
+    Koi source bina cache timestamp ke ho to None (us response ka ETag nahi banta).
+    """
+    cache_timestamps = analysis_result.get('cache_timestamps') or {}
+    if not cache_timestamps or None in cache_timestamps.values():
+        return None
+    news_links = [news.get('link') for news in analysis_result.get('latest_news') or []]
+    fingerprint = f"{symbol}:{sorted(cache_timestamps.items())}:{news_links}"
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
 # ================================
 # 1. Full Investment Analysis API
 # ================================
@@ -17,10 +53,22 @@ def full_analysis_api(symbol):
     analysis_result = generate_investment_advice(symbol.upper())
     if 'error' in analysis_result:
         print(f"[Error] {analysis_result['error']}")
-        return jsonify({"error": analysis_result['error']}), 500
+        return ojson({"error": analysis_result['error']}, 500)
         
     print("[Success] Full Analysis Complete.")
-    return jsonify(analysis_result), 200
+
+    # Client ke paas same version hai to body serialize/transfer hi nahi hoti
+    etag = analysis_etag(symbol.upper(), analysis_result)
+    # Flask-Compress compressed responses ke ETag mein ':br'/':gzip' jodta hai
+    if etag and any(tag.split(':')[0] == etag for tag in request.if_none_match):
+        response = app.response_class(status=304)
+    else:
+        response = ojson(analysis_result, 200)
+
+    if etag:
+        response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
 
 
 # ================================
@@ -33,30 +81,30 @@ def trending_stocks_api():
     
     try:
         trending_json_string = find_trending_stocks()
-        trending_data = json.loads(trending_json_string)
+        trending_data = orjson.loads(trending_json_string)
 
         if not trending_data:
             print("[Info] No trending stocks found.")
-            return jsonify({
+            return conditional(ojson({
                 "success": True,
                 "message": "No major trending stocks found.",
                 "results": []
-            }), 200
+            }, 200))
 
         print("[Success] Trending Stocks Found.")
-        return jsonify({
+        return conditional(ojson({
             "success": True,
             "message": "Trending stocks list.",
             "results": trending_data
-        }), 200
+        }, 200))
         
     except Exception as e:
         print(f"[Critical Error] {e}")
-        return jsonify({
+        return ojson({
             "success": False,
             "message": f"Backend processing failed: {e}",
             "results": []
-        }), 500
+        }, 500)
 
 
 # ================================
@@ -69,5 +117,6 @@ if __name__ == '__main__':
     print(" Routes:")
     print("   • /api/full-analysis/<symbol>")
     print("   • /api/trending-stocks")
+    print(" Production: gunicorn app:app (gunicorn.conf.py)")
     print("===========================================\n")
-    app.run(debug=True, port=5000, use_reloader=False)
\ No newline at end of file
+    app.run(port=5000, threaded=True, use_reloader=False)
\ No newline at end of file
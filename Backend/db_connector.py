@@ -8,26 +8,41 @@ load_dotenv()
 # Get MongoDB connection string
 MONGO_URI = os.getenv("MONGO_URI")
 
-# Global client and database handles
+# Cache database (stock_analysis_service ke collections)
+CACHE_DATABASE_NAME = "stock_analysis_cache"
+
+# Global client and database handles (ek hi shared client, poore process ke liye)
 client = None
 db = None
+cache_db = None
 
 if not MONGO_URI:
     print("FATAL: MONGO_URI not set. Database features will be disabled.")
 else:
     try:
-        # Establish and verify MongoDB connection
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        # Establish and verify MongoDB connection (pooled, thread-safe)
+        client = MongoClient(
+            MONGO_URI,
+            maxPoolSize=50,
+            minPoolSize=5,
+            waitQueueTimeoutMS=2500,
+            socketTimeoutMS=5000,
+            serverSelectionTimeoutMS=5000,
+            retryWrites=True,
+            compressors="zstd,snappy,zlib",  # Wire compression (server jo support kare)
+        )
         client.admin.command('ping')
         db = client.stock_analysis_db
+        cache_db = client[CACHE_DATABASE_NAME]
         print("MongoDB connection successful.")
     except Exception as e:
         print(f"MongoDB connection failed: {e}")
         client = None
         db = None
+        cache_db = None
 
 # Collections used across the project
-if db:
+if db is not None:
     TICKERS_COLLECTION = db.tickers_list
     ANALYSIS_CACHE_COLLECTION = db.analysis_cache
 else:
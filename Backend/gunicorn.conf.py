@@ -0,0 +1,17 @@
+# Gunicorn config (production server): gunicorn app:app
+# Gunicorn is file ko working directory se khud load karta hai.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# 4 processes x 8 threads = 32 concurrent requests (yfinance/Mongo I/O overlap hota hai)
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Cache miss par trending scan/full analysis slow ho sakte hain
+timeout = 120
+
+# Preload band: har worker fork ke BAAD app import karta hai, isliye shared MongoClient
+# (db_connector.py) har process mein alag banta hai (pymongo fork-safety).
+preload_app = False
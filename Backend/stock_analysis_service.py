@@ -1,18 +1,18 @@
 import requests
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from selectolax.lexbor import LexborHTMLParser
 from datetime import datetime, timedelta, time as dt_time
-import feedparser
+import defusedxml.ElementTree as DefusedET
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import json
-from decimal import Decimal, ROUND_HALF_UP
-import pymongo
-import time
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import orjson
+import functools
+from pymongo import ReplaceOne
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from db_connector import cache_db as MONGO_DB
 
 try:
     # VADER lexicon (sentiment analysis ke liye)
@@ -20,12 +20,13 @@ try:
 except LookupError:
     print("Downloading VADER lexicon...")
     nltk.download('vader_lexicon')
+
+# Shared VADER analyzer (lexicon ek hi baar load hota hai; polarity_scores thread-safe hai)
+VADER = SentimentIntensityAnalyzer()
     
 # --- CONFIGURATION (Sirf MongoDB) ---
 
-# MongoDB Configuration
-MONGO_URI = os.environ.get("MONGO_URI")
-MONGO_DATABASE = "stock_analysis_cache"
+# MongoDB Collections (shared client: db_connector.py)
 MONGO_LIVE_QUOTES_COLLECTION = "live_quotes"
 MONGO_FUNDAMENTAL_COLLECTION = "fundamental_cache"
 MONGO_HISTORICAL_COLLECTION = "historical_data" 
@@ -37,60 +38,167 @@ TTL_LIVE_QUOTE_SECONDS = 1800     # 30 Minutes for "Live" Price/Volume
 TTL_INTRADAY_SECONDS = 1800       # 30 Minutes for 1-Day/1-Week Chart
 TTL_FUNDAMENTAL_SECONDS = 1800    # 30 Minutes for Fundamental Data
 TTL_HISTORICAL_SECONDS = 86400    # 24 Hours for Historical Data (6M, 1Y, 5Y charts)
+TTL_STALE_GRACE_SECONDS = 86400   # TTL ke baad itni der stale copy rakhi jati hai (fetch fail fallback)
+
+# Har cache collection ka TTL (MongoDB TTL index collection-wide hota hai)
+CACHE_COLLECTION_TTLS = {
+    MONGO_LIVE_QUOTES_COLLECTION: TTL_LIVE_QUOTE_SECONDS,
+    MONGO_FUNDAMENTAL_COLLECTION: TTL_FUNDAMENTAL_SECONDS,
+    MONGO_HISTORICAL_COLLECTION: TTL_HISTORICAL_SECONDS,
+    MONGO_INTRADAY_1D_COLLECTION: TTL_INTRADAY_SECONDS,
+    MONGO_INTRADAY_5D_COLLECTION: TTL_INTRADAY_SECONDS,
+}
+
+#  YFINANCE BATCH DOWNLOAD
+# yf.download module-level shared state use karta hai, isliye ek time par ek hi batch download
+# (batch ke andar yfinance khud threads=True se parallel fetch karta hai)
+YFINANCE_DOWNLOAD_LOCK = threading.Lock()
+
+#  YAHOO SPARK (Multi-symbol live quotes)
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v8/finance/spark"
+YAHOO_SPARK_MAX_SYMBOLS = 20      # Ek spark URL mein max symbols
+
+# Shared HTTP session (connection pool + TLS reuse)
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
 # -----------------------------------------------
 
-# MongoDB Client Initialization
-MONGO_CLIENT = None
-MONGO_DB = None
-try:
-    MONGO_CLIENT = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    MONGO_CLIENT.admin.command('ping') 
-    MONGO_DB = MONGO_CLIENT[MONGO_DATABASE]
-    print("MongoDB connection successful.")
-except Exception as e:
-    print(f"MongoDB connection failed. Check if server is running: {e}")
+def ensure_cache_indexes():
+    """
+    Har cache collection par indexes banata hai:
+    unique 'key' index (lookups/upserts bina COLLSCAN) aur TTL index (purane documents MongoDB khud hata de).
+    """
+    if MONGO_DB is None:
+        return
+    for collection_name, ttl_seconds in CACHE_COLLECTION_TTLS.items():
+        collection = MONGO_DB[collection_name]
+        try:
+            collection.create_index([("key", 1)], unique=True)
+        except Exception as e:
+            print(f"WARNING: Could not create unique key index on {collection_name}: {e}")
+        try:
+            collection.create_index(
+                [("timestamp", 1)], expireAfterSeconds=ttl_seconds + TTL_STALE_GRACE_SECONDS
+            )
+        except Exception as e:
+            print(f"WARNING: Could not create TTL index on {collection_name}: {e}")
+
+ensure_cache_indexes()
 
 # Helper function to safely format large numbers
 def format_large_number(value):
     if value is None or not isinstance(value, (int, float)): return 'N/A'
     if abs(value) >= 1_000_000_000:
-        return f"{Decimal(value / 1_000_000_000).quantize(Decimal('0.01'), ROUND_HALF_UP)}B"
+        return f"{value / 1_000_000_000:.2f}B"
     if abs(value) >= 1_000_000:
-        return f"{Decimal(value / 1_000_000).quantize(Decimal('0.01'), ROUND_HALF_UP)}M"
+        return f"{value / 1_000_000:.2f}M"
     return str(value)
 
 # --- RELIABLE CACHING WRAPPER ---
-def check_and_get_cached_data(collection_name, key, fetch_function, ttl_seconds):
-    """Reliable caching logic with stale data fallback."""
+def _is_cache_fresh(result, ttl_seconds):
+    """Cached document TTL ke andar hai ya nahi."""
+    # timestamp BSON Date (UTC) hai; purane string timestamps ko stale maana jata hai
+    last_fetch_time = result.get('timestamp') if result else None
+    if not isinstance(last_fetch_time, datetime):
+        return False
+    return last_fetch_time >= datetime.utcnow() - timedelta(seconds=ttl_seconds)
+
+def _cache_timestamp():
+    """Current UTC time, BSON Date precision (milliseconds) tak truncated, taaki fresh aur cached reads same timestamp dein."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def check_and_get_cached_data(collection_name, key, fetch_function, ttl_seconds, with_timestamp=False):
+    """
+    Reliable caching logic with stale data fallback.
+    with_timestamp=True par (data, timestamp) return karta hai: timestamp = data kab fetch hua tha (Mongo na ho to None).
+    """
     if MONGO_DB is None: 
-        return fetch_function()
+        data, timestamp = fetch_function(), None
+        return (data, timestamp) if with_timestamp else data
         
     collection = MONGO_DB[collection_name]
     result = collection.find_one({"key": key})
     
-    is_stale = True
-    if result:
-        last_fetch_time = datetime.strptime(result['timestamp'], '%Y-%m-%d %H:%M:%S')
-        if datetime.now() < last_fetch_time + timedelta(seconds=ttl_seconds):
-            is_stale = False
-    
-    if not is_stale:
-        return result['data']
-    
-    new_data = fetch_function()
-    
-    if new_data is not None and not new_data.get('error'):
-        current_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        document = {"key": key, "data": new_data, "timestamp": current_time_str}
-        collection.replace_one({"key": key}, document, upsert=True)
-        return new_data
+    if _is_cache_fresh(result, ttl_seconds):
+        data, timestamp = result['data'], result['timestamp']
+    else:
+        new_data = fetch_function()
+        
+        if new_data is not None and not new_data.get('error'):
+            current_time = _cache_timestamp()
+            document = {"key": key, "data": new_data, "timestamp": current_time}
+            collection.replace_one({"key": key}, document, upsert=True)
+            data, timestamp = new_data, current_time
+        elif result:
+            print(f"WARNING: yfinance fetch failed for {key}. Serving stale data from cache.")
+            data, timestamp = result['data'], result.get('timestamp')
+        else:
+            print(f"ERROR: yfinance fetch failed for {key} and no cache available.")
+            data, timestamp = new_data, None
+
+    return (data, timestamp) if with_timestamp else data
+
+
+def check_and_get_cached_data_bulk(collection_name, keys, fetch_function_map, ttl_seconds, batch_fetch_function=None, with_timestamp=False, incremental=False):
+    """
+    Multi-key caching: ek $in read aur ek bulk_write, same stale data fallback ke saath.
+    batch_fetch_function (optional) saari stale keys ek call mein fetch karta hai;
+    jo keys usme nahi milti unke liye fetch_function_map[key]() chalta hai.
+    incremental=True par fetch function ko stale cached data milta hai (cache na ho to None),
+    taaki woh sirf naya hissa fetch kare.
+    Returns {key: data}; with_timestamp=True par ({key: data}, {key: timestamp}).
+    """
+    if MONGO_DB is None:
+        cached = {}
     else:
-        if result:
+        collection = MONGO_DB[collection_name]
+        cursor = collection.find({"key": {"$in": list(keys)}}, {"key": 1, "data": 1, "timestamp": 1})
+        cached = {doc['key']: doc for doc in cursor}
+
+    results = {}
+    timestamps = {}
+    stale_keys = []
+    for key in keys:
+        if _is_cache_fresh(cached.get(key), ttl_seconds):
+            results[key] = cached[key]['data']
+            timestamps[key] = cached[key]['timestamp']
+        else:
+            stale_keys.append(key)
+
+    if not stale_keys:
+        return (results, timestamps) if with_timestamp else results
+
+    batch_data = batch_fetch_function(stale_keys) if batch_fetch_function else {}
+    current_time = _cache_timestamp()
+    write_ops = []
+
+    for key in stale_keys:
+        if batch_data.get(key):
+            new_data = batch_data[key]
+        elif incremental:
+            new_data = fetch_function_map[key](cached[key]['data'] if key in cached else None)
+        else:
+            new_data = fetch_function_map[key]()
+
+        if new_data is not None and not new_data.get('error'):
+            document = {"key": key, "data": new_data, "timestamp": current_time}
+            write_ops.append(ReplaceOne({"key": key}, document, upsert=True))
+            results[key] = new_data
+            timestamps[key] = current_time if MONGO_DB is not None else None
+        elif key in cached:
             print(f"WARNING: yfinance fetch failed for {key}. Serving stale data from cache.")
-            return result['data']
+            results[key] = cached[key]['data']
+            timestamps[key] = cached[key].get('timestamp')
         else:
             print(f"ERROR: yfinance fetch failed for {key} and no cache available.")
-            return new_data 
+            results[key] = new_data
+            timestamps[key] = None
+
+    if write_ops and MONGO_DB is not None:
+        collection.bulk_write(write_ops, ordered=False)
+
+    return (results, timestamps) if with_timestamp else results
 
 
 # --- YFINANCE DATA FETCHING (Live/EOD) ---
@@ -111,6 +219,7 @@ def _fetch_yfinance_live_data_internal(ticker_symbol):
                 "Close": price, 
                 "Volume": volume, 
                 "Previous_Close": prev_close,
+                "LongName": info.get('longName'),
             }
         else:
             return {'error': True, 'message': 'Yfinance info data incomplete.'}
@@ -118,13 +227,71 @@ def _fetch_yfinance_live_data_internal(ticker_symbol):
     except Exception as e:
         return {'error': True, 'message': str(e)}
 
-def get_yfinance_live_quote(ticker_symbol: str):
+def _parse_spark_entry(entry):
+    """Spark response ke ek symbol entry ko live quote dict mein badalta hai."""
+    # Spark do shapes mein aata hai: {"response": [{"meta": {...}}]} ya flat {"meta": {...}, "close": [...]}
+    if entry.get('response'):
+        entry = entry['response'][0]
+    meta = entry.get('meta') or {}
+
+    price = meta.get('regularMarketPrice')
+    volume = meta.get('regularMarketVolume')
+    prev_close = meta.get('previousClose') or meta.get('chartPreviousClose') or entry.get('chartPreviousClose')
+
+    if price and volume and prev_close:
+        return {"Close": price, "Volume": volume, "Previous_Close": prev_close, "LongName": meta.get('longName')}
+    return None
+
+def _fetch_live_batch(ticker_list):
+    """Yahoo spark endpoint se ek request mein 20 tak tickers ke live quotes fetch karta hai."""
+    quotes = {}
+    for i in range(0, len(ticker_list), YAHOO_SPARK_MAX_SYMBOLS):
+        chunk = ticker_list[i:i + YAHOO_SPARK_MAX_SYMBOLS]
+        params = {
+            "symbols": ",".join(ticker + ".NS" for ticker in chunk),
+            "range": "1d", "interval": "1d", "indicators": "close",
+        }
+        try:
+            response = HTTP_SESSION.get(YAHOO_SPARK_URL, params=params, timeout=10)
+            response.raise_for_status()
+            payload = orjson.loads(response.content)
+
+            if 'spark' in payload:
+                entries = {entry.get('symbol'): entry for entry in payload['spark'].get('result') or []}
+            else:
+                entries = payload
+
+            for ticker in chunk:
+                entry = entries.get(ticker + ".NS")
+                quote = _parse_spark_entry(entry) if entry else None
+                if quote:
+                    quotes[ticker] = quote
+        except Exception as e:
+            print(f"Yahoo Spark batch error for {chunk}: {e}")
+    return quotes
+
+def get_yfinance_live_quote(ticker_symbol: str, with_timestamp=False):
     """Live/EOD quote ko 30-minute cache ke saath fetch karta hai."""
     return check_and_get_cached_data(
         MONGO_LIVE_QUOTES_COLLECTION,
         ticker_symbol,
         lambda: _fetch_yfinance_live_data_internal(ticker_symbol),
-        TTL_LIVE_QUOTE_SECONDS 
+        TTL_LIVE_QUOTE_SECONDS,
+        with_timestamp=with_timestamp
+    )
+
+def get_yfinance_live_quotes_bulk(ticker_list):
+    """
+    Kai tickers ke live quotes 30-minute cache ke saath fetch karta hai.
+    Cache ek hi $in query se padha jata hai; misses ek batched spark call se aate hain.
+    """
+    return check_and_get_cached_data_bulk(
+        MONGO_LIVE_QUOTES_COLLECTION,
+        ticker_list,
+        # Spark mein incomplete quote ho to single-ticker fallback
+        {ticker: (lambda t=ticker: _fetch_yfinance_live_data_internal(t)) for ticker in ticker_list},
+        TTL_LIVE_QUOTE_SECONDS,
+        batch_fetch_function=_fetch_live_batch
     )
 
 # --- YFINANCE (HISTORICAL AND FUNDAMENTAL) ---
@@ -138,28 +305,140 @@ def is_market_open():
     current_time = now.time()
     return market_start <= current_time <= market_end
 
-def _fetch_yfinance_historical_data(ticker_symbol, days_back=200):
-    """yfinance se NSE historical (Daily) data fetch karta hai."""
+def _fetch_yfinance_historical_data(ticker_symbol, days_back=200, cached_payload=None):
+    """
+    yfinance se NSE historical (Daily) data fetch karta hai.
+    cached_payload (purana cache) ho to sirf uski last date ke baad ke bars fetch karke append karta hai.
+    """
     nse_ticker = ticker_symbol + ".NS"  
     end_date = datetime.now().strftime('%Y-%m-%d')
     start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
     
+    if cached_payload:
+        incremental_payload = _append_new_historical_bars(nse_ticker, cached_payload, start_date, end_date)
+        if incremental_payload:
+            return incremental_payload
+
     try:
-        data = yf.download(nse_ticker, start=start_date, end=end_date, progress=False, auto_adjust=True)
+        # Ticker.history thread-safe hai (yf.download shared global state use karta hai)
+        data = yf.Ticker(nse_ticker).history(start=start_date, end=end_date, auto_adjust=True)
         if data.empty: 
             return {'error': True, 'message': 'Yfinance historical data empty.'}
             
-        if isinstance(data.columns, pd.MultiIndex): data.columns = data.columns.droplevel(1)
-        
-        data.columns = [col.strip() for col in data.columns]
-        data = data[['Close', 'Volume']].copy() 
-        
-        return json.loads(data.to_json(orient='table'))
+        return _historical_frame_to_payload(data)
         
     except Exception as e:
         print(f"Yfinance Historical Data Error for {ticker_symbol}: {e}")
         return {'error': True, 'message': str(e)}
 
+def _fetch_historical_batch(ticker_list, days_back=200):
+    """
+    Kai tickers ka historical (Daily) data ek hi yf.download call mein fetch karta hai.
+    Returns {ticker: payload}; jin tickers ka data nahi mila woh result mein nahi hote.
+    """
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+    payloads = {}
+
+    try:
+        with YFINANCE_DOWNLOAD_LOCK:
+            data = yf.download(
+                " ".join(ticker + ".NS" for ticker in ticker_list), start=start_date, end=end_date,
+                group_by='ticker', threads=True, progress=False, auto_adjust=True
+            )
+        if data.empty:
+            return payloads
+
+        for ticker in ticker_list:
+            nse_ticker = ticker + ".NS"
+            if nse_ticker not in data.columns.get_level_values(0):
+                continue
+            # Multi-ticker frame mein saari dates ka union hota hai; is ticker ki khaali rows hatao
+            ticker_data = data[nse_ticker].dropna(how='all')
+            if not ticker_data.empty:
+                payloads[ticker] = _historical_frame_to_payload(ticker_data)
+
+    except Exception as e:
+        print(f"Yfinance Historical Batch Error for {ticker_list}: {e}")
+
+    return payloads
+
+def _append_new_historical_bars(nse_ticker, cached_payload, start_date, end_date):
+    """
+    Cached daily series ke aage sirf naye bars fetch karke jodta hai (daily closes badalte nahi).
+    Last cached bar dobara fetch hota hai; uska adjusted Close badla ho (dividend/split) to None,
+    taaki caller poora history dobara fetch kare.
+    """
+    try:
+        cached_frame = _historical_json_to_frame(cached_payload)
+        if cached_frame is None or cached_frame.empty:
+            return None
+        last_date = cached_frame.index[-1]
+        if last_date < pd.Timestamp(start_date):
+            return None
+
+        new_data = yf.Ticker(nse_ticker).history(start=last_date.strftime('%Y-%m-%d'), end=end_date, auto_adjust=True)
+        if new_data.empty:
+            return None
+        new_data = _normalize_daily_frame(new_data)
+
+        if last_date not in new_data.index:
+            return None
+        cached_close, fetched_close = cached_frame.at[last_date, 'Close'], new_data.at[last_date, 'Close']
+        if abs(fetched_close - cached_close) > 1e-6 * max(abs(cached_close), 1):
+            print(f"{nse_ticker}: adjusted history changed, refetching full window.")
+            return None
+
+        merged = pd.concat([cached_frame.loc[cached_frame.index < last_date, ['Close', 'Volume']], new_data])
+        return _historical_frame_to_payload(merged[merged.index >= pd.Timestamp(start_date)])
+
+    except Exception as e:
+        print(f"Yfinance Incremental History Error for {nse_ticker}: {e}")
+        return None
+
+def _normalize_daily_frame(data):
+    """Daily yfinance frame ko flat columns, naive index aur sirf Close/Volume tak laata hai."""
+    if isinstance(data.columns, pd.MultiIndex): data.columns = data.columns.droplevel(1)
+    # Daily data ke liye yf.download jaisa naive (tz-free) index
+    if data.index.tz is not None: data.index = data.index.tz_localize(None)
+    
+    data.columns = [col.strip() for col in data.columns]
+    return data[['Close', 'Volume']].copy() 
+
+def _historical_frame_to_payload(data):
+    """Daily yfinance frame ko cache payload (records + precomputed metrics) mein badalta hai."""
+    data = _normalize_daily_frame(data)
+    
+    # Seedha BSON-compatible records (JSON string round-trip nahi)
+    # Derived metrics write ke waqt hi compute hote hain, cache hit par dobara nahi
+    return {
+        'schema': {'primaryKey': 'Date'},
+        'data': data.rename_axis('Date').reset_index().to_dict('records'),
+        'metrics': _compute_historical_metrics(data['Close']),
+    }
+
+def _compute_historical_metrics(close_prices):
+    """Daily closes se MA50 aur 52W high/low (last 250 rows) nikalta hai."""
+    last_year = close_prices.iloc[-250:]
+    return {
+        "ma50": float(close_prices.rolling(window=50).mean().iloc[-1]),
+        "high_52w": float(last_year.max()),
+        "low_52w": float(last_year.min()),
+    }
+
+def _historical_json_to_frame(data_json):
+    """
+    Cached historical payload ko DataFrame mein badalta hai (error par None).
+    Precomputed metrics frame.attrs['metrics'] mein milte hain (purane documents ke liye yahin compute).
+    """
+    if data_json and not data_json.get('error'):
+        frame = pd.DataFrame(data_json['data'])
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        frame = frame.set_index('Date')
+        frame.attrs['metrics'] = data_json.get('metrics') or _compute_historical_metrics(frame['Close'])
+        return frame
+    return None
+
 def get_stock_data(ticker_symbol, days_back=200):
     """Historical (Daily) data ko 24-hour cache ke saath fetch karta hai."""
     key = f"{ticker_symbol}_{days_back}"
@@ -171,10 +450,51 @@ def get_stock_data(ticker_symbol, days_back=200):
         TTL_HISTORICAL_SECONDS
     )
     
-    if data_json and not data_json.get('error'):
-        return pd.read_json(json.dumps(data_json), orient='table')
-    
-    return None 
+    return _historical_json_to_frame(data_json)
+
+def get_stock_data_for_tickers(ticker_list, days_back=200):
+    """
+    Kai tickers ka historical (Daily) data 24-hour cache ke saath fetch karta hai.
+    Misses ek batched yf.download se aate hain aur ek bulk_write mein cache hote hain. Returns {ticker: DataFrame}.
+    """
+    keys = {f"{ticker}_{days_back}": ticker for ticker in ticker_list}
+
+    def fetch_batch(stale_keys):
+        payloads = _fetch_historical_batch([keys[key] for key in stale_keys], days_back)
+        return {f"{ticker}_{days_back}": payload for ticker, payload in payloads.items()}
+
+    data_by_key = check_and_get_cached_data_bulk(
+        MONGO_HISTORICAL_COLLECTION,
+        list(keys),
+        # Batch mein na mila ticker akela dobara try hota hai
+        {key: (lambda t=ticker: _fetch_yfinance_historical_data(t, days_back)) for key, ticker in keys.items()},
+        TTL_HISTORICAL_SECONDS,
+        batch_fetch_function=fetch_batch
+    )
+
+    return {ticker: _historical_json_to_frame(data_by_key.get(key)) for key, ticker in keys.items()}
+
+def get_stock_data_bulk(ticker_symbol, days_back_list, with_timestamp=False):
+    """
+    Ek ticker ke kai historical windows ek grouped cache call mein fetch karta hai.
+    Returns {days_back: DataFrame}; with_timestamp=True par ({days_back: DataFrame}, {days_back: timestamp}).
+    """
+    keys = {f"{ticker_symbol}_{days_back}": days_back for days_back in days_back_list}
+
+    data_by_key, timestamps_by_key = check_and_get_cached_data_bulk(
+        MONGO_HISTORICAL_COLLECTION,
+        list(keys),
+        # Stale hone par sirf naye din ke bars append hote hain (5Y poora dobara fetch nahi)
+        {key: (lambda cached, d=days_back: _fetch_yfinance_historical_data(ticker_symbol, d, cached)) for key, days_back in keys.items()},
+        TTL_HISTORICAL_SECONDS,
+        with_timestamp=True,
+        incremental=True
+    )
+
+    frames = {days_back: _historical_json_to_frame(data_by_key.get(key)) for key, days_back in keys.items()}
+    if with_timestamp:
+        return frames, {days_back: timestamps_by_key.get(key) for key, days_back in keys.items()}
+    return frames
 
 # 🟢 1-Day/5-Day Intraday Data Fetcher (Graph Fix)
 def _fetch_yfinance_intraday_data(ticker_symbol, period="1d", interval="5m"):
@@ -190,21 +510,23 @@ def _fetch_yfinance_intraday_data(ticker_symbol, period="1d", interval="5m"):
                  start_date = (end_date - timedelta(days=1)).replace(hour=9, minute=15, second=0, microsecond=0)
                  end_date = (end_date - timedelta(days=1)).replace(hour=15, minute=30, second=0, microsecond=0)
             
-            data = yf.download(
-                nse_ticker, start=start_date, end=end_date, 
-                interval=interval, progress=False, auto_adjust=True
+            # Ticker.history: parallel fetches mein safe (yf.download jaisa shared state nahi)
+            data = yf.Ticker(nse_ticker).history(
+                start=start_date, end=end_date, 
+                interval=interval, auto_adjust=True
             )
         else:
             # 5d ke liye standard period
-            data = yf.download(
-                nse_ticker, period=period, interval=interval, 
-                progress=False, auto_adjust=True
+            data = yf.Ticker(nse_ticker).history(
+                period=period, interval=interval, 
+                auto_adjust=True
             )
         
         if data.empty:
             print(f"Yfinance Intraday: No {period} data found for {ticker_symbol}")
             return {'error': True, 'message': f'No {period} intraday data found.'}
         
+        if isinstance(data.columns, pd.MultiIndex): data.columns = data.columns.droplevel(1)
         data.reset_index(inplace=True)
         
         date_col = 'Datetime' if 'Datetime' in data.columns else 'index'
@@ -213,28 +535,30 @@ def _fetch_yfinance_intraday_data(ticker_symbol, period="1d", interval="5m"):
         data['date'] = data['date'].dt.strftime('%Y-%m-%dT%H:%M:%S')
         data = data[['date', 'Close']]
         
-        return json.loads(data.to_json(orient='table'))
+        return {'data': data.to_dict('records')}
         
     except Exception as e:
         print(f"Yfinance Intraday Fetch Error for {ticker_symbol}: {e}")
         return {'error': True, 'message': str(e)}
 
-def get_intraday_data_1d(ticker_symbol: str):
+def get_intraday_data_1d(ticker_symbol: str, with_timestamp=False):
     """1-Day chart data ko 30-minute cache ke saath fetch karta hai."""
     return check_and_get_cached_data(
         MONGO_INTRADAY_1D_COLLECTION,
         f"{ticker_symbol}_1d",
         lambda: _fetch_yfinance_intraday_data(ticker_symbol, period="1d", interval="5m"),
-        TTL_INTRADAY_SECONDS
+        TTL_INTRADAY_SECONDS,
+        with_timestamp=with_timestamp
     )
 
-def get_intraday_data_5d(ticker_symbol: str):
+def get_intraday_data_5d(ticker_symbol: str, with_timestamp=False):
     """1-Week (5d) chart data ko 30-minute cache ke saath fetch karta hai."""
     return check_and_get_cached_data(
         MONGO_INTRADAY_5D_COLLECTION,
         f"{ticker_symbol}_5d",
         lambda: _fetch_yfinance_intraday_data(ticker_symbol, period="5d", interval="15m"),
-        TTL_INTRADAY_SECONDS
+        TTL_INTRADAY_SECONDS,
+        with_timestamp=with_timestamp
     )
 
 def _fetch_basic_fundamental_data_live(ticker_symbol):
@@ -248,7 +572,7 @@ def _fetch_basic_fundamental_data_live(ticker_symbol):
         
         market_cap_val = info.get('marketCap')
         if market_cap_val:
-            fundamental_details['MarketCap'] = f"₹{Decimal(market_cap_val / 10_000_000).quantize(Decimal('0.01'), ROUND_HALF_UP)} Cr"
+            fundamental_details['MarketCap'] = f"₹{market_cap_val / 10_000_000:.2f} Cr"
         else:
             fundamental_details['MarketCap'] = 'N/A'
 
@@ -272,29 +596,55 @@ def _fetch_basic_fundamental_data_live(ticker_symbol):
         print(f"Error fetching Fundamental data for {ticker_symbol}: {e}")
         return {'error': True, 'message': str(e)}
         
-def get_basic_fundamental_data(ticker_symbol):
+def get_basic_fundamental_data(ticker_symbol, with_timestamp=False):
     """Fundamental data ko 30-MINUTE cache ke saath fetch karta hai."""
     return check_and_get_cached_data(
         MONGO_FUNDAMENTAL_COLLECTION,
         ticker_symbol,
         lambda: _fetch_basic_fundamental_data_live(ticker_symbol),
-        TTL_FUNDAMENTAL_SECONDS # 30 minutes (1800s)
+        TTL_FUNDAMENTAL_SECONDS, # 30 minutes (1800s)
+        with_timestamp=with_timestamp
     )
         
+def _parse_nifty_50_symbols(html):
+    """Wikipedia page ki constituents wikitable se sirf 'Symbol' column nikalta hai."""
+    tree = LexborHTMLParser(html)
+    for table in tree.css('table.wikitable'):
+        rows = table.css('tr')
+        if not rows:
+            continue
+        header = [cell.text(strip=True) for cell in rows[0].css('th, td')]
+        if 'Symbol' not in header:
+            continue
+
+        symbol_col = header.index('Symbol')
+        symbols = []
+        for row in rows[1:]:
+            cells = row.css('th, td')
+            if len(cells) > symbol_col and cells[symbol_col].text(strip=True):
+                symbols.append(cells[symbol_col].text(strip=True))
+        return symbols
+
+    raise Exception("Nifty 50 constituents table not found.")
+
+@functools.lru_cache(maxsize=2)
+def _get_nifty_50_tickers_cached(day_bucket):
+    """Wikipedia se Nifty 50 list scrape karta hai; har din (day_bucket) ke liye sirf ek baar."""
+    url = "https://en.wikipedia.org/wiki/NIFTY_50"
+    response = HTTP_SESSION.get(url, timeout=10)
+    
+    if response.status_code == 200:
+        symbols = _parse_nifty_50_symbols(response.text)
+        # Tuple taaki cached list caller se modify na ho
+        return tuple(symbols[:30])
+    else:
+        # Exception lru_cache mein store nahi hota, agli call dobara try karegi
+        raise Exception(f"Request failed with status code: {response.status_code}")
+
 def get_nifty_50_tickers_dynamic():
-    """Wikipedia se Nifty 50 current list scrape karta hai."""
+    """Nifty 50 current list (in-process cache, roz ek baar refresh)."""
     try:
-        url = "https://en.wikipedia.org/wiki/NIFTY_50"
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data_list = pd.read_html(response.content)  
-            nifty_table = data_list[1]  
-            tickers = nifty_table['Symbol'].tolist()[:30] 
-            return tickers
-        else:
-            raise Exception(f"Request failed with status code: {response.status_code}")
+        return list(_get_nifty_50_tickers_cached(datetime.utcnow().toordinal()))
 
     except Exception as e:
         print(f"Error fetching dynamic Nifty 50 list: {e}. Using hardcoded backup.")
@@ -308,25 +658,31 @@ def _fetch_latest_news_and_analyze(query):
     news_list = []
     
     try:
-        feed = feedparser.parse(rss_url)
-        for entry in feed.entries[:5]:
-            news_list.append({"title": entry.title, "source": entry.source.title if hasattr(entry, 'source') else 'Unknown', "link": entry.link, "published": entry.published_parsed})
+        # Feed fetch/parse fail (429/503, timeout, captcha HTML) = khaali feed, jaise feedparser 'bozo' par karta tha
+        try:
+            response = HTTP_SESSION.get(rss_url, timeout=5)
+            response.raise_for_status()
+            root = DefusedET.fromstring(response.content)
+            for item in root.findall('.//item')[:5]:
+                if not item.findtext('title'):
+                    continue
+                news_list.append({"title": item.findtext('title'), "source": item.findtext('source', default='Unknown'), "link": item.findtext('link'), "published": item.findtext('pubDate')})
+        except Exception as feed_e:
+            print(f"Google News feed unavailable for {query}: {feed_e}")
+            news_list = []
         
         if not news_list:
             return {"sentiment": "Neutral", "score": 0.0, "news_count": 0, "news_headlines": []}
             
-        analyser = SentimentIntensityAnalyzer()
-        compound_scores = []
-        news_headlines = []
-        for news in news_list:
-            title_score = analyser.polarity_scores(news['title'])
-            compound_scores.append(title_score['compound'])
-            news_headlines.append({"title": news['title'], "source": news['source'], "link": news['link']})
-        avg_score = sum(compound_scores) / len(compound_scores)
+        titles = [news['title'] for news in news_list]
+        compound_scores = np.fromiter(
+            (VADER.polarity_scores(title)['compound'] for title in titles),
+            dtype=np.float64, count=len(titles)
+        )
+        avg_score = float(compound_scores.mean())
+        news_headlines = [{"title": news['title'], "source": news['source'], "link": news['link']} for news in news_list]
         
-        if avg_score >= 0.1: sentiment = "Positive"
-        elif avg_score <= -0.1: sentiment = "Negative"
-        else: sentiment = "Neutral"
+        sentiment = np.select([avg_score >= 0.1, avg_score <= -0.1], ["Positive", "Negative"], default="Neutral").item()
             
         return {"sentiment": sentiment, "score": round(avg_score, 4), "news_count": len(news_list), "news_headlines": news_headlines}
 
@@ -348,96 +704,112 @@ def find_trending_stocks():
     """
     Volume aur momentum ke basis par trending stocks find karta hai.
     Sabhi data (Live/EOD, Historical) Yfinance se (cached) aata hai.
+    Network fetch batched hota hai (spark + yf.download); calculation vectorized.
     """
     
     market_open = is_market_open() 
     tickers_list = get_nifty_50_tickers_dynamic()
     
-    DELAY_PER_TICKER_SECONDS = 1.5
-    
     try:
-        trending_list = []
-        
-        for ticker in tickers_list:
-            try:
-                live_data = get_yfinance_live_quote(ticker) 
-                historical_data = get_stock_data(ticker, days_back=30) 
-
-                print(f"[{ticker}] Data fetched. Waiting {DELAY_PER_TICKER_SECONDS}s for rate limit...")
-                time.sleep(DELAY_PER_TICKER_SECONDS)
-
-                if live_data is None or live_data.get('error') or historical_data is None: 
-                    if live_data and live_data.get('error'):
-                        print(f"Skipping {ticker} due to Yfinance Live error: {live_data.get('message')}")
-                    else:
-                        print(f"Skipping {ticker}: Yfinance historical data failed.")
-                    continue
+        # --- Stage 1: Data Fetch (I/O bound) ---
+        # Live quotes: ek bulk cache read + batched spark requests
+        live_quotes = get_yfinance_live_quotes_bulk(tickers_list)
 
-                # --- Data Extraction ---
-                try:
-                    current_volume = live_data.get('Volume', 0)
-                    latest_price = live_data.get('Close', 0)
-                    prev_close = live_data.get('Previous_Close', 0)
-                    
-                    source_text = "Live (Yfinance)" if market_open else "EOD (Yfinance)"
-                    
-                    historical_data['Volume_Avg_20d'] = historical_data['Volume'].rolling(window=20).mean()
-                    avg_volume = historical_data['Volume_Avg_20d'].iloc[-1]
-                        
-                except Exception as e:
-                    print(f"Skipping {ticker}: Error extracting volume data. {e}")
-                    continue 
-
-                if pd.isna(avg_volume) or avg_volume == 0:
-                    print(f"Skipping {ticker}: Historical Average Volume is Zero/Missing.")
-                    continue
+        # Historical data: ek bulk cache read + ek batched yf.download
+        histories = get_stock_data_for_tickers(tickers_list, days_back=30)
 
-                if current_volume is None or current_volume == 0:
-                    current_volume = 1 
+        fetched = {
+            ticker: {"live_data": live_quotes.get(ticker), "historical_data": histories.get(ticker)}
+            for ticker in tickers_list
+        }
 
-                volume_increase = current_volume / avg_volume
+        # --- Stage 2: Validation ---
+        valid = {}
+        for ticker in tickers_list:
+            if ticker not in fetched:
+                continue
+            live_data = fetched[ticker]['live_data']
+            historical_data = fetched[ticker]['historical_data']
 
-                start_price = historical_data['Close'].iloc[-5] 
-                end_price = latest_price 
-                    
-                if pd.isna(start_price) or start_price == 0:
-                    price_change_5d = 0
+            if live_data is None or live_data.get('error') or historical_data is None: 
+                if live_data and live_data.get('error'):
+                    print(f"Skipping {ticker} due to Yfinance Live error: {live_data.get('message')}")
                 else:
-                    price_change_5d = ((end_price - start_price) / start_price) * 100
-                    
-                
-                # --- VOLUME FILTER (TRENDING CRITERIA) ---
-                if True: # Testing ke liye hamesha True
-                    
-                    try:
-                        ticker_obj = yf.Ticker(ticker + ".NS")
-                        long_name = ticker_obj.info.get('longName', ticker + " Ltd.")
-                    except:
-                        long_name = ticker + " Ltd."
-
-                    if prev_close and latest_price:
-                        today_change_percent = ((latest_price - prev_close) / prev_close) * 100
-                    else:
-                        today_change_percent = 0.0
-
-                    reason_text = (f"Volume ({round(current_volume, 0)}) vs Avg ({round(avg_volume, 0)}) - Momentum ({round(price_change_5d, 2)}%) (Source: {source_text})")
-                        
-                    trending_list.append({
-                        "ticker": ticker, "name": long_name, "current_price": round(latest_price, 2),
-                        "today_change_percent": round(today_change_percent, 2), "volume_factor": round(volume_increase, 2),
-                        "price_change_5d": round(price_change_5d, 2), "reason": reason_text
-                    })
-            
-            except Exception as ticker_e:
-                print(f"Error processing ticker {ticker}: {ticker_e}") 
+                    print(f"Skipping {ticker}: Yfinance historical data failed.")
                 continue
-
-        trending_list.sort(key=lambda x: x['volume_factor'], reverse=True)
-        return json.dumps(trending_list[:30])
+            valid[ticker] = fetched[ticker]
+
+        if not valid:
+            return orjson.dumps([]).decode()
+
+        source_text = "Live (Yfinance)" if market_open else "EOD (Yfinance)"
+
+        # --- Stage 3: Vectorized Calculation (saare tickers ek saath, main thread) ---
+        history = pd.concat(
+            [valid[ticker]['historical_data'][['Close', 'Volume']] for ticker in valid],
+            keys=list(valid), names=['ticker', 'date']
+        )
+        by_ticker = history.groupby(level='ticker', sort=False)
+
+        # 20-day rolling mean ki last value = last 20 rows ka mean (NaN/kam rows par NaN)
+        last_20_volume = by_ticker.tail(20).groupby(level='ticker', sort=False)['Volume']
+        avg_volume = last_20_volume.mean().where(last_20_volume.count() == 20)
+        start_prices = by_ticker['Close'].nth(-5).droplevel('date')
+
+        stocks = pd.DataFrame.from_dict({
+            ticker: {
+                # Company name live quote payload mein hi aata hai (alag .info call nahi)
+                "name": data['live_data'].get('LongName') or f"{ticker} Ltd.",
+                "latest_price": data['live_data'].get('Close', 0),
+                "current_volume": data['live_data'].get('Volume', 0),
+                "prev_close": data['live_data'].get('Previous_Close', 0),
+            }
+            for ticker, data in valid.items()
+        }, orient='index')
+        stocks[['latest_price', 'prev_close']] = stocks[['latest_price', 'prev_close']].astype(float)
+        stocks['current_volume'] = pd.to_numeric(stocks['current_volume'])
+        stocks['avg_volume'] = avg_volume
+        stocks['start_price'] = start_prices
+
+        missing_start = stocks['start_price'].isna() & ~stocks.index.isin(start_prices.index)
+        for ticker in stocks.index[missing_start]:
+            print(f"Error processing ticker {ticker}: not enough history for 5-day momentum.")
+        no_avg_volume = ~missing_start & (stocks['avg_volume'].isna() | (stocks['avg_volume'] == 0))
+        for ticker in stocks.index[no_avg_volume]:
+            print(f"Skipping {ticker}: Historical Average Volume is Zero/Missing.")
+        stocks = stocks[~missing_start & ~no_avg_volume].copy()
+
+        stocks['current_volume'] = stocks['current_volume'].where(stocks['current_volume'] > 0, 1)
+        stocks['volume_factor'] = stocks['current_volume'] / stocks['avg_volume']
+
+        start = stocks['start_price']
+        stocks['price_change_5d'] = ((stocks['latest_price'] - start) / start * 100).where(start.notna() & (start != 0), 0.0)
+
+        has_prices = (stocks['prev_close'].fillna(0) != 0) & (stocks['latest_price'].fillna(0) != 0)
+        stocks['today_change_percent'] = ((stocks['latest_price'] - stocks['prev_close']) / stocks['prev_close'] * 100).where(has_prices, 0.0)
+
+        # --- VOLUME FILTER (TRENDING CRITERIA) ---
+        # Testing ke liye abhi saare tickers include hote hain
+        stocks['reason'] = (
+            "Volume (" + stocks['current_volume'].round(0).astype(str)
+            + ") vs Avg (" + stocks['avg_volume'].round(0).astype(str)
+            + ") - Momentum (" + stocks['price_change_5d'].round(2).astype(str)
+            + f"%) (Source: {source_text})"
+        )
+
+        stocks = stocks.rename(columns={"latest_price": "current_price"}).round(
+            {"current_price": 2, "today_change_percent": 2, "volume_factor": 2, "price_change_5d": 2}
+        )
+        stocks = stocks.sort_values('volume_factor', ascending=False, kind='stable').head(30)
+        trending_list = stocks.rename_axis('ticker').reset_index()[
+            ["ticker", "name", "current_price", "today_change_percent", "volume_factor", "price_change_5d", "reason"]
+        ].to_dict('records')
+
+        return orjson.dumps(trending_list).decode()
     
     except Exception as e:
         print(f"FATAL ERROR in find_trending_stocks function: {e}")
-        return json.dumps([])
+        return orjson.dumps([]).decode()
 
 
 def generate_investment_advice(ticker_symbol):
@@ -446,24 +818,40 @@ def generate_investment_advice(ticker_symbol):
     Sabhi data Yfinance se (cached) aata hai.
     """
 
-    # 1. Data Fetching
-    price_data_long = get_stock_data(ticker_symbol, days_back=1825)
-    price_data_short = get_stock_data(ticker_symbol, days_back=200)
-
-    # 🟢 NEW: 1-Day Chart Data (30-min cached)
-    intraday_data_1d_json = get_intraday_data_1d(ticker_symbol)
-    
-    # 🟢 NEW: 1-Week Chart Data (30-min cached)
-    intraday_data_5d_json = get_intraday_data_5d(ticker_symbol)
-
-    # Latest Data (30-min cached)
-    live_data = get_yfinance_live_quote(ticker_symbol)
-    
-    # Fundamental Data (30-min cached)
-    fundamental_data = get_basic_fundamental_data(ticker_symbol) 
-    
-    # Sentiment Data (NO CACHE)
-    news_sentiment = analyze_news_sentiment(ticker_symbol) 
+    # 1. Data Fetching (saare fetch independent hain, isliye parallel)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        # Historical Data: 5Y + 200-day ek grouped cache call (24-hour cached)
+        f_price = executor.submit(get_stock_data_bulk, ticker_symbol, (1825, 200), with_timestamp=True)
+        # 🟢 NEW: 1-Day Chart Data (30-min cached)
+        f_intraday_1d = executor.submit(get_intraday_data_1d, ticker_symbol, with_timestamp=True)
+        # 🟢 NEW: 1-Week Chart Data (30-min cached)
+        f_intraday_5d = executor.submit(get_intraday_data_5d, ticker_symbol, with_timestamp=True)
+        # Latest Data (30-min cached)
+        f_live = executor.submit(get_yfinance_live_quote, ticker_symbol, with_timestamp=True)
+        # Fundamental Data (30-min cached)
+        f_fundamental = executor.submit(get_basic_fundamental_data, ticker_symbol, with_timestamp=True)
+        # Sentiment Data (NO CACHE)
+        f_news = executor.submit(analyze_news_sentiment, ticker_symbol)
+
+        price_frames, price_timestamps = f_price.result()
+        intraday_data_1d_json, intraday_1d_timestamp = f_intraday_1d.result()
+        intraday_data_5d_json, intraday_5d_timestamp = f_intraday_5d.result()
+        live_data, live_timestamp = f_live.result()
+        fundamental_data, fundamental_timestamp = f_fundamental.result()
+        news_sentiment = f_news.result()
+
+    price_data_long = price_frames[1825]
+    price_data_short = price_frames[200]
+
+    # Har cached source kab fetch hua tha (API layer isse ETag banati hai)
+    cache_timestamps = {
+        source: timestamp.isoformat() if isinstance(timestamp, datetime) else None
+        for source, timestamp in {
+            "historical_5y": price_timestamps[1825], "historical_200d": price_timestamps[200],
+            "intraday_1d": intraday_1d_timestamp, "intraday_5d": intraday_5d_timestamp,
+            "live_quote": live_timestamp, "fundamentals": fundamental_timestamp,
+        }.items()
+    }
 
     # Fallback Logic:
     eod_price = price_data_short['Close'].iloc[-1] if price_data_short is not None and not price_data_short.empty else None
@@ -487,14 +875,16 @@ def generate_investment_advice(ticker_symbol):
             "sentiment_score": news_sentiment.get('score', 0), "sentiment_status": news_sentiment.get('sentiment', "Unknown"),
             "latest_news": news_sentiment.get('latest_news', []), "historical_data": {}, "additional_metrics": {},
             "latest_price": latest_price or 0,
-            "today_change_percent": today_change_percent
+            "today_change_percent": today_change_percent,
+            "cache_timestamps": cache_timestamps
         }
         return advice_details
     
-    _close_prices = price_data_short['Close'].iloc[-250:] if not price_data_short.empty else pd.Series()
+    # MA50 / 52W High-Low cache write ke waqt precompute hote hain
+    price_metrics = price_data_short.attrs['metrics']
     additional_metrics = {
-        "52W High": f"₹{_close_prices.max().round(2)}" if not _close_prices.empty else 'N/A',
-        "52W Low": f"₹{_close_prices.min().round(2)}" if not _close_prices.empty else 'N/A',
+        "52W High": f"₹{round(price_metrics['high_52w'], 2)}",
+        "52W Low": f"₹{round(price_metrics['low_52w'], 2)}",
     }
 
     historical_data_for_frontend = {}
@@ -530,9 +920,8 @@ def generate_investment_advice(ticker_symbol):
         historical_data_for_frontend['1 Year'] = [{'date': date.strftime('%Y-%m-%d'), 'price': price} for date, price in extract_slice_trading_days(price_data_long, 250).items()]
         historical_data_for_frontend['5 Year'] = [{'date': date.strftime('%Y-%m-%d'), 'price': price} for date, price in price_data_long['Close'].items()]
 
-    price_data['MA50'] = price_data['Close'].rolling(window=50).mean()
     current_price = latest_price 
-    ma50_value = price_data['MA50'].iloc[-1]
+    ma50_value = price_metrics['ma50']
     technical_signal = (current_price > ma50_value)
 
     pe_val = fundamental_data.get('TrailingPE') if fundamental_data else None
@@ -558,8 +947,9 @@ def generate_investment_advice(ticker_symbol):
         "advice": advice, "reason_summary": reason_summary, "risk_level": risk_level,
         "fundamentals": fundamental_data if fundamental_data else {"status": "Fundamental data unavailable."},
         "sentiment_score": news_sentiment.get('score', 0), "sentiment_status": news_sentiment.get('sentiment', "Unknown"),
-        "latest_news": news_sentiment['news_headlines'], "historical_data": historical_data_for_frontend, "additional_metrics": additional_metrics,
+        "latest_news": news_sentiment.get('news_headlines', []), "historical_data": historical_data_for_frontend, "additional_metrics": additional_metrics,
         # 🟢 FIX: Live data ko response mein bhejna
         "latest_price": latest_price,
-        "today_change_percent": today_change_percent
+        "today_change_percent": today_change_percent,
+        "cache_timestamps": cache_timestamps
     }
\ No newline at end of file
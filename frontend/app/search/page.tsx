@@ -65,7 +65,7 @@ async function getFullAnalysis(ticker: string): Promise<FullAnalysisData | null>
   const API_URL = `https://aifsa.onrender.com/api/full-analysis/${ticker}`;
   try {
     const response = await fetch(API_URL, {
-      cache: 'no-store',
+      cache: 'no-cache',
       headers: { Accept: 'application/json' },
     });
     if (!response.ok) {
@@ -31,7 +31,7 @@ async function getTrendingStocks(): Promise<RankedTrendingStock[]> {
   const API_URL = 'https://aifsa.onrender.com/api/trending-stocks';
   try {
     const response = await fetch(API_URL, {
-      cache: 'no-store',
+      cache: 'no-cache',
       headers: { Accept: 'application/json' },
     });
     if (!response.ok) {
@@ -145,7 +145,7 @@ const StockDetails: React.FC<StockDetailsProps> = ({ stock, onBack }) => {
       setIsLoadingDetails(true);
       const API_URL = `https://aifsa.onrender.com/api/full-analysis/${stock.ticker}`;
       try {
-        const response = await fetch(API_URL, { cache: 'no-store' });
+        const response = await fetch(API_URL, { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to fetch detailed stock data');
 
         const data: LiveStockDetails = await response.json();